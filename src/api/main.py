@@ -1,29 +1,39 @@
 # src/api/main.py (Versión FINAL - Rebote Corregido: Link EcoTV)
 
 import os
-import requests
-import openai
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Depends, status, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel
+from pydantic import BaseModel, conint
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 import psycopg2
 import psycopg2.extras
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-from bs4 import BeautifulSoup
 import math
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlencode
+import json
 import re 
 import mimetypes
 import io
 import shutil
-import trafilatura
+from functools import lru_cache
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import time
+from starlette.routing import Match
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from src.schema import apply_schema
+from src.resilience import guarded_request, breakers_snapshot, OBSERVERS, CircuitOpenError
+from requests.exceptions import ConnectTimeout, HTTPError, ConnectionError as RequestsConnectionError
+from urllib3.exceptions import NewConnectionError
+from src.api.metrics import METRICS, PROFILER, TimedConnection, start_request, record_http
+# trafilatura, openai y passlib se importan en su primer uso (arranque rápido de la API)
 
 # --- CONFIGURACIÓN ---
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
@@ -34,15 +44,17 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 30 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai_client = openai.OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
 FACEBOOK_PAGE_ID = os.getenv("FACEBOOK_PAGE_ID")
 FACEBOOK_ACCESS_TOKEN = os.getenv("FACEBOOK_ACCESS_TOKEN")
-FACEBOOK_GRAPH_API_URL_BASE = "https://graph.facebook.com/v18.0"
+FACEBOOK_GRAPH_API_URL_BASE = os.getenv("FACEBOOK_GRAPH_API_URL_BASE", "https://graph.facebook.com/v18.0")
+FB_BATCH_LIMIT = 50  # máximo de operaciones por request 'batch' de la Graph API
+FB_BATCH_TIMEOUT = 120  # segundos; 50 operaciones /photos pueden tardar
 WP_URL = os.getenv("WP_URL")
 WP_USER = os.getenv("WP_USER")
 WP_APP_PASSWORD = os.getenv("WP_APP_PASSWORD")
 PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "")
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "8"))  # hilos totales para publicar en varios destinos
 
 # DB CONFIG
 DB_CONFIG = {
@@ -94,6 +106,19 @@ class PaginatedPostsResponse(BaseModel):
     total_pages: int
 class SelectedIds(BaseModel):
     ids: List[int]
+class BulkUpdate(BaseModel):
+    ids: List[int]
+    status: str | None = None
+    category: str | None = None
+    publication_mode: str | None = None
+    scheduled_at: datetime | None = None
+class BulkSchedule(BaseModel):
+    ids: List[int]
+    window_start: datetime
+    window_end: datetime
+    # Minutos mínimos entre publicaciones por plataforma (cada post sale en FB y WP)
+    spacing: dict[str, conint(ge=0)] = {"facebook": 30, "wordpress": 15}
+    publication_mode: str | None = None
 class RegenerateRequest(BaseModel):
     field_to_update: str
     custom_prompt: str
@@ -101,9 +126,29 @@ class RegenerateRequest(BaseModel):
 class Settings(BaseModel):
     scraper_interval: int
     publish_interval: int
+class Destination(BaseModel):
+    name: str
+    kind: str                      # 'wordpress' | 'facebook'
+    base_url: str | None = None    # WP: URL del sitio
+    account_id: str | None = None  # WP: usuario / FB: page id
+    secret: str | None = None      # WP: app password / FB: access token
+    site_id: int | None = None     # FB: destino WP cuyo link usa el rebote
+    max_parallel: int = 2
+    is_active: bool = True
+class TargetSet(BaseModel):
+    destination_ids: List[int]
+class ProfilerRequest(BaseModel):
+    requests: int = 10
+    route: str | None = None  # p.ej. "POST /posts/process-selected"; None = cualquier ruta
 
 # --- APP ---
-app = FastAPI(title="Automatizador API (Docker)")
+@asynccontextmanager
+async def lifespan(app):
+    # Migración idempotente del esquema al arrancar (ver ensure_schema)
+    await run_in_threadpool(ensure_schema)
+    yield
+
+app = FastAPI(title="Automatizador API (Docker)", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 static_dir = "/app/src/static"
@@ -112,18 +157,89 @@ static_images_dir = os.path.join(static_dir, 'images')
 if not os.path.exists(static_images_dir): os.makedirs(static_images_dir, exist_ok=True)
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+# --- MÉTRICAS: latencia por ruta, tiempo DB/HTTP, log de lentas y profiler ---
+OBSERVERS.append(record_http)
+
+UNMATCHED_ROUTE = "<unmatched>"  # 404/405 (escáneres, rutas viejas): una sola entrada, no una por URL
+UNPROFILED_ROUTES = {"GET /healthz", "GET /readyz"}  # los healthchecks no consumen peticiones del profiler
+
+def route_key(request):
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL: return f"{request.method} {route.path}"
+    return UNMATCHED_ROUTE
+
+@app.middleware("http")
+async def timing_middleware(request, call_next):
+    stats = start_request()
+    key = route_key(request)
+    profiled = key not in UNPROFILED_ROUTES and PROFILER.claim(key)
+    t0 = time.perf_counter()
+    try: response = await call_next(request)
+    finally:
+        elapsed = time.perf_counter() - t0
+        if profiled: PROFILER.release()
+        METRICS.record(key, elapsed, stats)
+    response.headers["Server-Timing"] = f"app;dur={elapsed*1000:.1f}, db;dur={stats['db']*1000:.1f}, http;dur={stats['http']*1000:.1f}"
+    return response
+
 @app.get("/")
 async def read_index(): return FileResponse("/app/index.html")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# --- SALUD (healthchecks de docker-compose y espera del scheduler) ---
+@app.get("/healthz")
+def healthz(): return {"status": "ok"}
+
+# Migración idempotente al arrancar: las tablas nuevas existen sin correr create_admin.py
+SCHEMA_READY = False
+_SCHEMA_LOCK = threading.Lock()
+
+def ensure_schema():
+    global SCHEMA_READY
+    with _SCHEMA_LOCK:
+        if SCHEMA_READY: return True
+        conn = get_db_connection()
+        if not conn: return False
+        try:
+            with conn.cursor() as cur: apply_schema(cur)
+            conn.commit()
+            SCHEMA_READY = True
+        except psycopg2.Error as e: print(f"❌ Error aplicando esquema: {e}")
+        finally: conn.close()
+        return SCHEMA_READY
+
+@app.get("/readyz")
+def readyz():
+    """Lista solo si el esquema está aplicado (se reintenta si la DB tardó en arrancar) y la DB
+    acepta conexiones y responde a una consulta, en cada llamada."""
+    if not ensure_schema(): raise HTTPException(503, "DB no disponible o esquema sin aplicar")
+    conn = get_db_connection()
+    if not conn: raise HTTPException(503, "DB no disponible")
+    try:
+        with conn.cursor() as cur: cur.execute("SELECT 1")
+    except psycopg2.Error: raise HTTPException(503, "DB no disponible")
+    finally: conn.close()
+    return {"status": "ready"}
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # --- UTILS ---
 def get_db_connection():
-    try: return psycopg2.connect(**DB_CONFIG)
+    try: return psycopg2.connect(**DB_CONFIG, connection_factory=TimedConnection)
     except: return None
 
-def verify_password(plain, hashed): return pwd_context.verify(plain, hashed)
+@lru_cache(maxsize=None)
+def get_openai_client():
+    if not OPENAI_API_KEY: return None
+    import openai
+    return openai.OpenAI(api_key=OPENAI_API_KEY)
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def verify_password(plain, hashed): return get_pwd_context().verify(plain, hashed)
 
 def get_user(db, username):
     with db.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
@@ -149,10 +265,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if user is None: raise HTTPException(401, "Usuario no existe")
     return dict(user)
 
+async def require_admin(user: dict = Depends(get_current_user)):
+    if user.get('role') != 'admin': raise HTTPException(403, "Solo administradores")
+    return user
+
 def extract_article_text(url: str):
     try:
-        d = trafilatura.fetch_url(url)
-        return trafilatura.extract(d) if d else None
+        import trafilatura
+        r = guarded_request("get", url, timeout=15)
+        return trafilatura.extract(r.text) if r.ok else None
     except: return None
 
 def get_pretty_source_name(source_url: str) -> str:
@@ -164,9 +285,11 @@ def get_pretty_source_name(source_url: str) -> str:
 
 # --- PUBLISHING LOGIC CORREGIDA ---
 
-def publish_to_facebook(post_data: dict, publish_url: Optional[str] = None, force_link_post: bool = False):
-    if not FACEBOOK_PAGE_ID: return False, "No creds FB"
-    
+def _fb_creds(dest: Optional[dict] = None):
+    return (dest['account_id'], dest['secret']) if dest else (FACEBOOK_PAGE_ID, FACEBOOK_ACCESS_TOKEN)
+
+def build_facebook_request(post_data: dict, publish_url: Optional[str], force_link_post: bool, page_id: str):
+    """Devuelve (edge relativo, payload sin access_token) según el modo de publicación."""
     title = post_data.get('fb_title', '')
     post_text = post_data.get('fb_content', '')
     
@@ -180,46 +303,102 @@ def publish_to_facebook(post_data: dict, publish_url: Optional[str] = None, forc
     if img and img.startswith('/static') and not img.startswith('http'):
         if PUBLIC_API_URL: img = f"{PUBLIC_API_URL}{img}"
     
-    # Modo Link (Rebote Link)
+    # Modo Link (Rebote Link): Facebook genera la vista previa desde 'link'
     if force_link_post and publish_url:
-        url = f"{FACEBOOK_GRAPH_API_URL_BASE}/{FACEBOOK_PAGE_ID}/feed"
-        # En modo link, Facebook genera la vista previa desde 'link'
-        payload = {'message': f"{title}\n\n{post_text}", 'link': publish_url, 'access_token': FACEBOOK_ACCESS_TOKEN}
+        return f"{page_id}/feed", {'message': f"{title}\n\n{post_text}", 'link': publish_url}
     
-    # Modo Foto (Rebote Foto)
-    elif img and not img.startswith('/static'):
-        url = f"{FACEBOOK_GRAPH_API_URL_BASE}/{FACEBOOK_PAGE_ID}/photos"
-        # En modo foto, el link va en el 'caption' (mensaje)
-        payload = {'url': img, 'caption': msg, 'access_token': FACEBOOK_ACCESS_TOKEN}
+    # Modo Foto (Rebote Foto): el link va en el 'caption' (mensaje)
+    if img and not img.startswith('/static'):
+        return f"{page_id}/photos", {'url': img, 'caption': msg}
     
     # Fallback (Solo texto)
-    else:
-        url = f"{FACEBOOK_GRAPH_API_URL_BASE}/{FACEBOOK_PAGE_ID}/feed"
-        payload = {'message': msg, 'access_token': FACEBOOK_ACCESS_TOKEN}
-    
+    return f"{page_id}/feed", {'message': msg}
+
+def publish_to_facebook(post_data: dict, publish_url: Optional[str] = None, force_link_post: bool = False, dest: Optional[dict] = None):
+    page_id, token = _fb_creds(dest)
+    if not page_id: return False, "No creds FB"
+    edge, payload = build_facebook_request(post_data, publish_url, force_link_post, page_id)
     try:
-        r = requests.post(url, data=payload, timeout=60)
+        r = guarded_request("post", f"{FACEBOOK_GRAPH_API_URL_BASE}/{edge}", data={**payload, 'access_token': token}, timeout=60)
         r.raise_for_status()
         return True, r.json()
     except Exception as e: return False, str(e)
 
-def _upload_image_to_wp(image_url: str, title: str):
-    if not image_url or not WP_URL: return None
+def _batch_never_sent(e: Exception):
+    """True si el batch seguro no llegó a ejecutarse en Graph (reenviarlo no duplica)."""
+    if isinstance(e, (CircuitOpenError, ConnectTimeout)): return True
+    # 4xx: Graph rechazó el batch entero sin ejecutarlo (token, formato). Un 5xx o error de
+    # gateway puede llegar cuando ya se ejecutó parte de las operaciones: es ambiguo
+    if isinstance(e, HTTPError): return e.response is not None and 400 <= e.response.status_code < 500
+    # ConnectionError también cubre cortes a mitad de respuesta: solo cuenta si no hubo conexión
+    reason = getattr(e.args[0], 'reason', None) if isinstance(e, RequestsConnectionError) and e.args else None
+    return isinstance(reason, NewConnectionError)
+
+def publish_batch_to_facebook(items: list, dest: Optional[dict] = None):
+    """Publica varios posts en una página con requests 'batch' de la Graph API (hasta
+    FB_BATCH_LIMIT operaciones por llamada). `items` son tuplas (post_data, publish_url,
+    force_link_post); devuelve [(ok, respuesta)] en el mismo orden.
+    Solo se reintenta una a una lo que seguro no se publicó: sub-respuestas null o 5xx, o el
+    batch entero si no llegó a Graph o este lo rechazó con un 4xx. Ante un fallo ambiguo (timeout
+    de lectura, 5xx del batch, respuesta que no es una lista) los posts quedan en error sin
+    reenviarse, para no duplicarlos en la página."""
+    page_id, token = _fb_creds(dest)
+    if not page_id: return [(False, "No creds FB")] * len(items)
+    if len(items) == 1: return [publish_to_facebook(*items[0], dest=dest)]
+    results = []
+    for start in range(0, len(items), FB_BATCH_LIMIT):
+        chunk = items[start:start + FB_BATCH_LIMIT]
+        ops = []
+        for post_data, publish_url, force_link_post in chunk:
+            edge, payload = build_facebook_request(post_data, publish_url, force_link_post, page_id)
+            ops.append({"method": "POST", "relative_url": edge, "body": urlencode(payload)})
+        try:
+            r = guarded_request("post", FACEBOOK_GRAPH_API_URL_BASE, data={'access_token': token, 'batch': json.dumps(ops)}, timeout=FB_BATCH_TIMEOUT)
+            r.raise_for_status()
+            responses = r.json()
+            # Un 200 con un dict de error o null no dice qué se publicó: se trata como ambiguo
+            if not isinstance(responses, list): raise ValueError(f"Respuesta batch inesperada: {str(responses)[:200]}")
+        except Exception as e:
+            if _batch_never_sent(e): results.extend(publish_to_facebook(*item, dest=dest) for item in chunk)
+            else: results.extend([(False, f"Batch ambiguo, no se reintenta: {str(e)[:200]}")] * len(chunk))
+            continue
+        for i, item in enumerate(chunk):
+            # Cada sub-respuesta es {"code", "headers", "body": "<json>"} o null si no se completó
+            sub = responses[i] if i < len(responses) else None
+            if sub is None:
+                results.append(publish_to_facebook(*item, dest=dest))
+                continue
+            code = sub.get('code') if isinstance(sub, dict) else None
+            if not isinstance(code, int): results.append((False, f"Sub-respuesta inesperada, no se reintenta: {str(sub)[:200]}"))
+            elif code >= 500: results.append(publish_to_facebook(*item, dest=dest))
+            elif 200 <= code < 300:
+                try: results.append((True, json.loads(sub.get('body') or '{}')))
+                except ValueError: results.append((True, {}))
+            else: results.append((False, (sub.get('body') or f"HTTP {code}")[:500]))  # 4xx: permisos/validación, reintentar no sirve
+    return results
+
+def _wp_creds(dest: Optional[dict] = None):
+    return (dest['base_url'], dest['account_id'], dest['secret']) if dest else (WP_URL, WP_USER, WP_APP_PASSWORD)
+
+def _upload_image_to_wp(image_url: str, title: str, dest: Optional[dict] = None):
+    wp_url, wp_user, wp_pass = _wp_creds(dest)
+    if not image_url or not wp_url: return None
     full_url = image_url
     if full_url.startswith('/static') and PUBLIC_API_URL: full_url = f"{PUBLIC_API_URL}{full_url}"
     elif full_url.startswith('/static'): return None
     try:
-        ir = requests.get(full_url, timeout=20)
+        ir = guarded_request("get", full_url, timeout=20)
         ir.raise_for_status()
         filename = os.path.basename(urlparse(full_url).path) or "image.jpg"
         files = {'file': ('img.jpg', io.BytesIO(ir.content), mimetypes.guess_type(full_url)[0] or 'image/jpeg')}
-        r = requests.post(f"{WP_URL.rstrip('/')}/wp-json/wp/v2/media", files=files, auth=(WP_USER, WP_APP_PASSWORD), timeout=45)
+        r = guarded_request("post", f"{wp_url.rstrip('/')}/wp-json/wp/v2/media", files=files, auth=(wp_user, wp_pass), timeout=45)
         return r.json().get('id') if r.ok else None
     except: return None
 
-def publish_to_wordpress(post_data: dict):
-    if not WP_URL: return False, "No creds WP"
-    mid = _upload_image_to_wp(post_data.get('image_url'), post_data.get('wp_title'))
+def publish_to_wordpress(post_data: dict, dest: Optional[dict] = None):
+    wp_url, wp_user, wp_pass = _wp_creds(dest)
+    if not wp_url: return False, "No creds WP"
+    mid = _upload_image_to_wp(post_data.get('image_url'), post_data.get('wp_title'), dest)
     cat = WP_CATEGORY_MAP.get(post_data.get('category'), 1)
     data = {
         'title': post_data.get('wp_title'),
@@ -229,13 +408,52 @@ def publish_to_wordpress(post_data: dict):
     }
     if mid: data['featured_media'] = mid
     try:
-        r = requests.post(f"{WP_URL.rstrip('/')}/wp-json/wp/v2/posts", json=data, auth=(WP_USER, WP_APP_PASSWORD), timeout=45)
+        r = guarded_request("post", f"{wp_url.rstrip('/')}/wp-json/wp/v2/posts", json=data, auth=(wp_user, wp_pass), timeout=45)
         r.raise_for_status()
         # Devolvemos el objeto JSON para obtener el link generado
         return True, r.json()
     except Exception as e: return False, str(e)
 
 # --- ENDPOINTS ---
+@app.get("/admin/metrics")
+def admin_metrics(user: dict=Depends(require_admin)): return METRICS.snapshot()
+
+@app.get("/admin/slow-requests")
+def admin_slow_requests(user: dict=Depends(require_admin)): return list(METRICS.slow)[::-1]
+
+@app.post("/admin/profiler")
+def admin_profiler_arm(req: ProfilerRequest, user: dict=Depends(require_admin)):
+    # Perfila las próximas N peticiones (de una ruta, si se indica)
+    return PROFILER.arm(req.requests, req.route)
+
+@app.delete("/admin/profiler")
+def admin_profiler_disarm(user: dict=Depends(require_admin)): return PROFILER.disarm()
+
+@app.get("/admin/profiler", response_class=PlainTextResponse)
+def admin_profiler_output(user: dict=Depends(require_admin)):
+    # Formato "folded": flamegraph.pl perfil.txt > perfil.svg, o abrir en speedscope.app
+    return PROFILER.folded()
+
+@app.get("/resilience/breakers")
+def list_breakers(user: dict=Depends(get_current_user)):
+    # Breakers de este proceso (WordPress, Graph API) más los de las fuentes, que viven en el
+    # worker del scraper y se leen del último estado que guardó (ver 'updated_at')
+    items = [dict(b, process='api', updated_at=None) for b in breakers_snapshot()]
+    conn = get_db_connection()
+    if not conn: return items
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute("""
+                SELECT host, CASE WHEN retry_until > LOCALTIMESTAMP THEN 'open' WHEN trips > 0 THEN 'half_open' ELSE 'closed' END AS state,
+                       trips, GREATEST(0, ROUND(EXTRACT(EPOCH FROM retry_until - LOCALTIMESTAMP)::numeric, 1))::float AS retry_in,
+                       last_error, process, updated_at
+                FROM breaker_states ORDER BY process, host
+            """)
+            items += [dict(r) for r in cur.fetchall()]
+    except psycopg2.Error as e: print(f"⚠️ No se pudieron leer breakers guardados: {e}")
+    finally: conn.close()
+    return items
+
 @app.post("/token", response_model=Token)
 async def login_token(form: OAuth2PasswordRequestForm = Depends()):
     conn = get_db_connection()
@@ -318,9 +536,69 @@ def update_post(post_id: int, update: PostUpdate, user: dict=Depends(get_current
     conn.close()
     return dict(res)
 
+@app.post("/posts/bulk-update")
+def bulk_update(payload: BulkUpdate, user: dict=Depends(get_current_user)):
+    """Aplica los mismos cambios a muchos posts en un solo UPDATE (una transacción)."""
+    data = payload.model_dump(exclude_unset=True, exclude={'ids'})
+    if not payload.ids or not data: raise HTTPException(400, "Nada que actualizar")
+    fields = [f"{k}=%s" for k in data.keys()] + ["updated_at=NOW()"]
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute(f"UPDATE posts SET {', '.join(fields)} WHERE id=ANY(%s) RETURNING id", tuple(data.values()) + (payload.ids,))
+        updated = [r[0] for r in cur.fetchall()]
+        conn.commit()
+    conn.close()
+    return {"message": "OK", "updated": updated}
+
+def compute_schedule_slots(count: int, start: datetime, end: datetime, spacing: dict, taken: List[datetime]):
+    """Reparte `count` horarios dentro de [start, end] respetando el espaciado mínimo
+    por plataforma y los horarios ya programados. Devuelve menos slots si no caben."""
+    gap = timedelta(minutes=max(spacing.values(), default=0))
+    taken = sorted(taken)
+    slots, t, i = [], start, 0
+    while len(slots) < count and t <= end:
+        # Saltar los programados que ya no pueden chocar con t
+        while i < len(taken) and taken[i] + gap <= t: i += 1
+        if i < len(taken) and taken[i] - gap < t:
+            t = taken[i] + gap
+            continue
+        slots.append(t)
+        t += gap if gap else timedelta(minutes=1)
+    return slots
+
+@app.post("/posts/bulk-schedule")
+def bulk_schedule(payload: BulkSchedule, user: dict=Depends(get_current_user)):
+    """Auto-programador: asigna `scheduled_at` a los ids en la ventana dada y los marca como 'programado'."""
+    if not payload.ids: raise HTTPException(400, "Sin ids")
+    # scheduled_at es hora local sin zona (como LOCALTIMESTAMP): una ventana con zona se convierte antes
+    start, end = (t.astimezone().replace(tzinfo=None) if t.tzinfo else t for t in (payload.window_start, payload.window_end))
+    if end < start: raise HTTPException(400, "Ventana inválida")
+    gap = timedelta(minutes=max(payload.spacing.values(), default=0))
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT scheduled_at FROM posts WHERE status='programado' AND NOT (id=ANY(%s)) AND scheduled_at BETWEEN %s AND %s", (payload.ids, start - gap, end + gap))
+        taken = [r[0] for r in cur.fetchall()]
+        # Solo posts ya redactados; publicados, eliminados, crudos o con error no se reprograman
+        cur.execute("SELECT id FROM posts WHERE id=ANY(%s) AND status IN ('pendiente','programado') FOR UPDATE", (payload.ids,))
+        eligible = {r[0] for r in cur.fetchall()}
+        ids = [pid for pid in payload.ids if pid in eligible]
+        slots = compute_schedule_slots(len(ids), start, end, payload.spacing, taken)
+        rows = [(pid, ts, payload.publication_mode) for pid, ts in zip(ids, slots)]
+        done = {}
+        if rows:
+            res = psycopg2.extras.execute_values(cur, """
+                UPDATE posts p SET scheduled_at=v.ts, status='programado', publication_mode=COALESCE(v.mode, p.publication_mode), updated_at=NOW()
+                FROM (VALUES %s) AS v(id, ts, mode) WHERE p.id=v.id AND p.status IN ('pendiente','programado')
+                RETURNING p.id, p.scheduled_at
+            """, rows, template="(%s, %s::timestamp, %s::varchar)", page_size=len(rows), fetch=True)
+            done = dict(res)
+        conn.commit()
+    conn.close()
+    return {"message": "OK", "scheduled": [{"id": pid, "scheduled_at": done[pid]} for pid in payload.ids if pid in done], "unscheduled": [pid for pid in payload.ids if pid not in done]}
+
 @app.post("/posts/process-selected")
 def process_sel(payload: SelectedIds, user: dict=Depends(get_current_user)):
-    if not openai_client: raise HTTPException(500, "No OpenAI")
+    if not get_openai_client(): raise HTTPException(500, "No OpenAI")
     conn = get_db_connection()
     for pid in payload.ids: _process_single_post_with_chatgpt(pid)
     conn.close()
@@ -328,7 +606,7 @@ def process_sel(payload: SelectedIds, user: dict=Depends(get_current_user)):
 
 @app.post("/posts/process-all-raw")
 def process_all(user: dict=Depends(get_current_user)):
-    if not openai_client: raise HTTPException(500, "No OpenAI")
+    if not get_openai_client(): raise HTTPException(500, "No OpenAI")
     conn = get_db_connection()
     with conn.cursor() as cur: cur.execute("SELECT id FROM posts WHERE status='crudo'"); ids = [r[0] for r in cur.fetchall()]
     conn.close()
@@ -348,7 +626,7 @@ def _process_single_post_with_chatgpt(post_id):
             return
         sys_p = f"Eres editor de {post.get('category')}. Genera: <FB-TITLE>..</FB-TITLE> <FB-POST>..hashtags..</FB-POST> <WP-TITLE>..</WP-TITLE> <WP-CONTENT>..</WP-CONTENT>"
         user_p = f"Articulo:\n{txt[:4000]}"
-        resp = openai_client.chat.completions.create(model="gpt-4o-mini", messages=[{"role":"system","content":sys_p},{"role":"user","content":user_p}])
+        resp = get_openai_client().chat.completions.create(model="gpt-4o-mini", messages=[{"role":"system","content":sys_p},{"role":"user","content":user_p}])
         c = resp.choices[0].message.content
         fb_t = re.search(r'<FB-TITLE>(.*?)</FB-TITLE>', c, re.DOTALL).group(1).strip() if '<FB-TITLE>' in c else "Titulo"
         fb_p = re.search(r'<FB-POST>(.*?)</FB-POST>', c, re.DOTALL).group(1).strip() if '<FB-POST>' in c else c
@@ -364,24 +642,72 @@ def _process_single_post_with_chatgpt(post_id):
 @app.post("/posts/delete-selected")
 def delete_sel(payload: SelectedIds, user: dict=Depends(get_current_user)):
     conn = get_db_connection()
-    with conn.cursor() as cur: cur.execute("UPDATE posts SET status='eliminado' WHERE id=ANY(%s)", (payload.ids,)); conn.commit()
+    with conn.cursor() as cur: cur.execute("UPDATE posts SET status='eliminado', updated_at=NOW() WHERE id=ANY(%s)", (payload.ids,)); conn.commit()
     conn.close()
     return {"message": "OK"}
 
+# --- ARCHIVO (mantiene pequeña la tabla 'posts') ---
+ARCHIVE_BATCH_SIZE = 500
+
+def archive_old_posts(days: int, batch_size: int = ARCHIVE_BATCH_SIZE):
+    """Mueve a 'posts_archive' los publicados/eliminados sin cambios en `days` días.
+    Trabaja por lotes (una transacción corta cada uno) para no bloquear la cola."""
+    total = 0
+    conn = get_db_connection()
+    try:
+        while True:
+            with conn.cursor() as cur:
+                # Se cuentan las filas borradas de 'posts'; si el source_url ya estaba en el
+                # archivo, la fila archivada se actualiza en lugar de perderse
+                cur.execute("""
+                    WITH moved AS (
+                        DELETE FROM posts WHERE id IN (
+                            SELECT id FROM posts
+                            WHERE status IN ('publicado','eliminado') AND updated_at < NOW() - make_interval(days => %s)
+                            ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+                        ) RETURNING *
+                    ), archived AS (
+                        INSERT INTO posts_archive SELECT * FROM moved
+                        ON CONFLICT (source_url) DO UPDATE SET
+                            source_title=EXCLUDED.source_title, image_url=EXCLUDED.image_url,
+                            status=EXCLUDED.status, category=EXCLUDED.category, fb_title=EXCLUDED.fb_title,
+                            fb_content=EXCLUDED.fb_content, wp_title=EXCLUDED.wp_title, wp_content=EXCLUDED.wp_content,
+                            updated_at=EXCLUDED.updated_at, scheduled_at=EXCLUDED.scheduled_at, publication_mode=EXCLUDED.publication_mode
+                    )
+                    SELECT COUNT(*) FROM moved
+                """, (days, batch_size))
+                moved = cur.fetchone()[0]
+                conn.commit()
+            total += moved
+            if moved < batch_size: break
+    finally: conn.close()
+    return total
+
+@app.post("/posts/archive")
+def archive_posts(days: Optional[int] = None, user: dict=Depends(get_current_user)):
+    if days is None:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT value_int FROM settings WHERE key='archive_after_days'")
+            row = cur.fetchone()
+        conn.close()
+        days = row[0] if row else 30
+    return {"message": "OK", "archived": archive_old_posts(days)}
+
 @app.post("/posts/{post_id}/regenerate-quick", response_model=Post)
 async def regenerate_quick(post_id: int, platform: str = Query(...), user: dict = Depends(get_current_user)):
     return _process_single_post_with_chatgpt(post_id) or {}
 
 @app.post("/posts/regenerate-custom", response_model=Post)
 async def regenerate_custom(req: RegenerateRequest, user: dict = Depends(get_current_user)):
-    if not openai_client: raise HTTPException(500)
+    if not get_openai_client(): raise HTTPException(500)
     conn = get_db_connection()
     with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
         cur.execute("SELECT * FROM posts WHERE id=%s", (req.post_id,))
         post = cur.fetchone()
     conn.close()
     txt = extract_article_text(post['source_url'])
-    resp = openai_client.chat.completions.create(model="gpt-4o-mini", messages=[{"role":"user","content":f"Ref:{txt[:2000]} Instr:{req.custom_prompt}"}])
+    resp = get_openai_client().chat.completions.create(model="gpt-4o-mini", messages=[{"role":"user","content":f"Ref:{txt[:2000]} Instr:{req.custom_prompt}"}])
     val = resp.choices[0].message.content
     conn = get_db_connection()
     with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
@@ -391,10 +717,199 @@ async def regenerate_custom(req: RegenerateRequest, user: dict = Depends(get_cur
     conn.close()
     return dict(r)
 
+# --- DESTINOS (varias páginas FB y sitios WP) ---
+DEST_FIELDS = "id, name, kind, base_url, account_id, site_id, max_parallel, is_active"
+
+@app.get("/destinations")
+def list_destinations(user: dict=Depends(get_current_user)):
+    conn = get_db_connection()
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute(f"SELECT {DEST_FIELDS} FROM destinations ORDER BY id")
+        items = [dict(r) for r in cur.fetchall()]
+    conn.close()
+    return items
+
+@app.post("/destinations")
+def create_destination(d: Destination, user: dict=Depends(require_admin)):
+    if d.kind not in ('wordpress', 'facebook'): raise HTTPException(400, "kind debe ser 'wordpress' o 'facebook'")
+    conn = get_db_connection()
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute(f"INSERT INTO destinations (name, kind, base_url, account_id, secret, site_id, max_parallel, is_active) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING {DEST_FIELDS}",
+                    (d.name, d.kind, d.base_url, d.account_id, d.secret, d.site_id, d.max_parallel, d.is_active))
+        res = cur.fetchone()
+        conn.commit()
+    conn.close()
+    return dict(res)
+
+@app.put("/destinations/{dest_id}")
+def update_destination(dest_id: int, d: Destination, user: dict=Depends(require_admin)):
+    if d.kind not in ('wordpress', 'facebook'): raise HTTPException(400, "kind debe ser 'wordpress' o 'facebook'")
+    conn = get_db_connection()
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        # secret vacío = conservar el actual (la API nunca lo devuelve)
+        cur.execute(f"UPDATE destinations SET name=%s, kind=%s, base_url=%s, account_id=%s, secret=COALESCE(NULLIF(%s, ''), secret), site_id=%s, max_parallel=%s, is_active=%s WHERE id=%s RETURNING {DEST_FIELDS}",
+                    (d.name, d.kind, d.base_url, d.account_id, d.secret, d.site_id, d.max_parallel, d.is_active, dest_id))
+        res = cur.fetchone()
+        conn.commit()
+    conn.close()
+    if not res: raise HTTPException(404, "Destino no existe")
+    with _DEST_LOCK: _DEST_SEMAPHORES.pop(dest_id, None)
+    return dict(res)
+
+@app.get("/posts/{post_id}/destinations")
+def get_post_targets(post_id: int, user: dict=Depends(get_current_user)):
+    conn = get_db_connection()
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute("SELECT pd.destination_id, d.name, d.kind, pd.status, pd.link, pd.result, pd.updated_at FROM post_destinations pd JOIN destinations d ON d.id=pd.destination_id WHERE pd.post_id=%s ORDER BY d.id", (post_id,))
+        items = [dict(r) for r in cur.fetchall()]
+    conn.close()
+    return items
+
+@app.put("/posts/{post_id}/destinations")
+def set_post_targets(post_id: int, targets: TargetSet, user: dict=Depends(get_current_user)):
+    """Define en qué destinos sale el post. Sin conjunto propio, sale en todos los activos."""
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        # Los ya publicados se conservan como historial
+        cur.execute("DELETE FROM post_destinations WHERE post_id=%s AND status<>'publicado' AND NOT (destination_id=ANY(%s))", (post_id, targets.destination_ids))
+        if targets.destination_ids:
+            psycopg2.extras.execute_values(cur, "INSERT INTO post_destinations (post_id, destination_id) VALUES %s ON CONFLICT DO NOTHING", [(post_id, did) for did in targets.destination_ids])
+        conn.commit()
+    conn.close()
+    return get_post_targets(post_id, user)
+
+class PublishTargetsError(Exception):
+    """No se pudo decidir dónde publicar el post: el post queda en error, nunca cae al .env."""
+
+def get_publish_targets(post_id):
+    """Destinos activos del post (su conjunto propio o, si no tiene, todos), con su resultado previo.
+    Devuelve None solo si la tabla 'destinations' está vacía (se publica con la página FB y el
+    sitio WP del .env). Si la consulta falla o ningún destino del post está activo, lanza
+    PublishTargetsError: en una instalación con varias marcas el .env sería la marca equivocada."""
+    conn = get_db_connection()
+    if not conn: raise PublishTargetsError("DB no disponible para leer destinos")
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM destinations)")
+            if not cur.fetchone()[0]: return None
+            cur.execute("""
+                SELECT d.*, pd.status AS target_status, pd.link AS target_link
+                FROM destinations d
+                LEFT JOIN post_destinations pd ON pd.destination_id=d.id AND pd.post_id=%s
+                WHERE d.is_active AND (pd.post_id IS NOT NULL OR NOT EXISTS (SELECT 1 FROM post_destinations WHERE post_id=%s))
+                ORDER BY d.id
+            """, (post_id, post_id))
+            targets = [dict(r) for r in cur.fetchall()]
+    except psycopg2.Error as e: raise PublishTargetsError(f"No se pudieron leer destinos: {str(e)[:200]}")
+    finally: conn.close()
+    if not targets: raise PublishTargetsError("Ningún destino activo para este post")
+    return targets
+
+# Paralelismo acotado: un pool común y un semáforo por destino (max_parallel)
+FANOUT_POOL = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+def _fanout_submit(fn, *args):
+    # ThreadPoolExecutor no copia el contexto: sin esto las métricas de la petición
+    # (tiempo de DB y HTTP) no verían lo que hacen los hilos del fan-out
+    return FANOUT_POOL.submit(contextvars.copy_context().run, fn, *args)
+_DEST_SEMAPHORES = {}
+_DEST_LOCK = threading.Lock()
+
+def _dest_semaphore(dest):
+    with _DEST_LOCK:
+        if dest['id'] not in _DEST_SEMAPHORES: _DEST_SEMAPHORES[dest['id']] = threading.BoundedSemaphore(max(1, dest.get('max_parallel') or 1))
+        return _DEST_SEMAPHORES[dest['id']]
+
+def _facebook_post_link(res):
+    # /feed devuelve {'id': 'PAGE_POST'}; /photos devuelve {'id': FOTO, 'post_id': 'PAGE_POST'}
+    pid = (res.get('post_id') or res.get('id')) if isinstance(res, dict) else None
+    return f"https://www.facebook.com/{pid}" if pid else None
+
+def _publish_to_site(dest, post_data):
+    with _dest_semaphore(dest): ok, res = publish_to_wordpress(post_data, dest)
+    return ok, (res.get('link') if ok else None), ("OK" if ok else str(res)[:500])
+
+def _publish_to_page(dest, items):
+    # Todas las publicaciones pendientes de una página salen juntas (Graph API batch)
+    with _dest_semaphore(dest): res = publish_batch_to_facebook(items, dest)
+    return [(ok, _facebook_post_link(r) if ok else None, "OK" if ok else str(r)[:500]) for ok, r in res]
+
+MODE_LABELS = {'rebote_link': 'Rebote Link', 'rebote_foto': 'Rebote Foto'}
+
+def fan_out_publish(jobs):
+    """Publica cada (post, modo, destinos) de `jobs` en todos sus destinos: primero los
+    sitios WP en paralelo (son la fuente del rebote) y luego cada página FB, en paralelo
+    entre páginas y con un batch por página, usando el link de su sitio. Los destinos
+    que ya tienen el post publicado no se repiten. Devuelve [(estado, mensaje)]."""
+    results = [{t['id']: (True, t['target_link'], "OK") for t in targets if t['target_status'] == 'publicado'} for _, _, targets in jobs]
+
+    futures = {(i, t['id']): _fanout_submit(_publish_to_site, t, post)
+               for i, (post, _, targets) in enumerate(jobs) for t in targets if t['kind'] == 'wordpress' and t['id'] not in results[i]}
+    for (i, tid), f in futures.items(): results[i][tid] = f.result()
+
+    pages = {}  # destino FB -> (destino, [(índice del job, (post, link, force_link))])
+    for i, (post, mode, targets) in enumerate(jobs):
+        wp_links = {t['id']: results[i][t['id']][1] for t in targets if t['kind'] == 'wordpress' and results[i][t['id']][0]}
+        default_link = next(iter(wp_links.values()), None)
+        for t in targets:
+            if t['kind'] == 'facebook' and t['id'] not in results[i]:
+                # Cada página usa el link de su propio sitio; si ese sitio falló, None (cae al
+                # source_url) en vez del link de otra marca. Sin site_id, el primer sitio que salió.
+                link = wp_links.get(t['site_id']) if t['site_id'] else default_link
+                pages.setdefault(t['id'], (t, []))[1].append((i, (post, link, mode == 'rebote_link')))
+    futures = {tid: _fanout_submit(_publish_to_page, dest, [item for _, item in entries]) for tid, (dest, entries) in pages.items()}
+    for tid, f in futures.items():
+        for (i, _), r in zip(pages[tid][1], f.result()): results[i][tid] = r
+
+    rows = [(post['id'], tid, 'publicado' if ok else 'error_publishing', link, res) for (post, _, _), r in zip(jobs, results) for tid, (ok, link, res) in r.items()]
+    if rows:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO post_destinations (post_id, destination_id, status, link, result, updated_at) VALUES %s
+                ON CONFLICT (post_id, destination_id) DO UPDATE SET status=EXCLUDED.status, link=EXCLUDED.link, result=EXCLUDED.result, updated_at=EXCLUDED.updated_at
+            """, rows, template="(%s, %s, %s, %s, %s, NOW())")
+            conn.commit()
+        conn.close()
+
+    out = []
+    for (_, mode, targets), r in zip(jobs, results):
+        names = {t['id']: t['name'] for t in targets}
+        msg = f"{MODE_LABELS.get(mode, 'Auto')}. " + " ".join(f"{names[tid]}:{'OK' if ok else 'Fail'}" for tid, (ok, _, _) in r.items())
+        out.append(('publicado' if all(ok for ok, _, _ in r.values()) else 'error_publishing', msg))
+    return out
+
 # --- LÓGICA CENTRAL DE PUBLICACIÓN Y REBOTE ---
+def execute_publish_many(posts):
+    """Como execute_publish, para varios posts a la vez (drenado de cola o puesta al día tras
+    una caída): las publicaciones en una misma página de Facebook salen en requests batch."""
+    jobs, legacy, out = [], [], {}
+    for p in posts:
+        mode = p.get('publication_mode') or 'auto'
+        try: targets = get_publish_targets(p['id'])
+        except PublishTargetsError as e:
+            out[p['id']] = ('error_publishing', str(e))
+            continue
+        if targets is None: legacy.append((p, mode))
+        else: jobs.append((p, mode, targets))
+    out.update(zip([p['id'] for p, _, _ in jobs], fan_out_publish(jobs)))
+    if legacy:
+        # Página FB y sitio WP únicos del .env
+        wp = [f.result() for f in [_fanout_submit(publish_to_wordpress, p) for p, _ in legacy]]
+        fb = publish_batch_to_facebook([(p, res.get('link') if ok else None, mode == 'rebote_link') for (p, mode), (ok, res) in zip(legacy, wp)])
+        for (p, mode), (wp_ok, _), (fb_ok, _) in zip(legacy, wp, fb):
+            out[p['id']] = ('publicado' if (fb_ok and wp_ok) else 'error_publishing', f"{MODE_LABELS.get(mode, 'Auto')}. WP:{'OK' if wp_ok else 'Fail'} FB:{'OK' if fb_ok else 'Fail'}")
+    return [out[p['id']] for p in posts]
+
 def execute_publish(post_data, mode):
     """Lógica centralizada para publicar según el modo (auto, rebote_foto, rebote_link)"""
     
+    # Con destinos configurados en la DB se publica en todos ellos (fan-out);
+    # si no hay ninguno, se usa la página FB y el sitio WP únicos del .env.
+    try: targets = get_publish_targets(post_data['id'])
+    except PublishTargetsError as e: return 'error_publishing', str(e)
+    if targets is not None: return fan_out_publish([(post_data, mode, targets)])[0]
+
     fb_success, wp_success = False, False
     final_msg = ""
     
@@ -427,44 +942,51 @@ def execute_publish(post_data, mode):
     
     return final_status, final_msg
 
-@app.post("/posts/publish-scheduled")
-def pub_scheduled(user: dict=Depends(get_current_user)):
+def _claim_and_publish(where_order, limit):
+    """Reserva hasta `limit` posts (SKIP LOCKED), los publica y guarda su estado final.
+    Devuelve [(id, estado)]; con más de uno, Facebook sale en batch."""
     conn = get_db_connection()
     with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute("SELECT * FROM posts WHERE status='programado' AND scheduled_at <= LOCALTIMESTAMP LIMIT 1 FOR UPDATE SKIP LOCKED")
-        post = cur.fetchone()
-        if not post: return {"message": "Nada programado"}
-        cur.execute("UPDATE posts SET status='publicando' WHERE id=%s", (post['id'],)); conn.commit()
-    
-    d = dict(post)
-    mode = d.get('publication_mode', 'auto')
+        cur.execute(f"SELECT * FROM posts WHERE {where_order} LIMIT %s FOR UPDATE SKIP LOCKED", (limit,))
+        posts = [dict(r) for r in cur.fetchall()]
+        if posts: cur.execute("UPDATE posts SET status='publicando' WHERE id=ANY(%s)", ([p['id'] for p in posts],))
+        conn.commit()
+    conn.close()
+    if not posts: return []
     
-    # Usar la función centralizada
-    final, msg = execute_publish(d, mode)
+    # Usar la función centralizada. Pase lo que pase, los posts reservados no se quedan en 'publicando'.
+    try:
+        if len(posts) == 1: outcomes = [execute_publish(posts[0], posts[0].get('publication_mode', 'auto'))]
+        else: outcomes = execute_publish_many(posts)
+    except Exception as e:
+        print(f"❌ Error publicando {[p['id'] for p in posts]}: {e}")
+        outcomes = [('error_publishing', f"Error: {str(e)[:200]}")] * len(posts)
     
     conn = get_db_connection()
-    with conn.cursor() as cur: cur.execute("UPDATE posts SET status=%s, fb_content=%s, updated_at=NOW() WHERE id=%s", (final, msg, d['id'])); conn.commit()
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_values(cur, """
+            UPDATE posts p SET status=v.status, fb_content=v.msg, updated_at=NOW() FROM (VALUES %s) AS v(id, status, msg) WHERE p.id=v.id
+        """, [(p['id'], final, msg) for p, (final, msg) in zip(posts, outcomes)])
+        conn.commit()
     conn.close()
-    return {"message": f"Programado: {final}"}
+    return [(p['id'], final) for p, (final, _) in zip(posts, outcomes)]
+
+def _publish_summary(prefix, done):
+    if len(done) == 1: return f"{prefix}: {done[0][1]}"
+    return f"{prefix}: {sum(1 for _, st in done if st == 'publicado')}/{len(done)} publicados"
+
+@app.post("/posts/publish-scheduled")
+def pub_scheduled(limit: int = Query(1, ge=1, le=200), user: dict=Depends(get_current_user)):
+    done = _claim_and_publish("status='programado' AND scheduled_at <= LOCALTIMESTAMP ORDER BY scheduled_at ASC", limit)
+    if not done: return {"message": "Nada programado"}
+    return {"message": _publish_summary("Programado", done)}
 
 @app.post("/posts/publish-next")
-def pub_next(user: dict=Depends(get_current_user)):
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-        cur.execute("SELECT * FROM posts WHERE status='publicar' ORDER BY updated_at ASC LIMIT 1 FOR UPDATE SKIP LOCKED")
-        post = cur.fetchone()
-        if not post: return {"message": "Nada en cola"}
-        cur.execute("UPDATE posts SET status='publicando' WHERE id=%s", (post['id'],)); conn.commit()
-    
-    d = dict(post)
-    mode = d.get('publication_mode', 'auto') # La cola también respeta el modo
-    
-    final, msg = execute_publish(d, mode)
-    
-    conn = get_db_connection()
-    with conn.cursor() as cur: cur.execute("UPDATE posts SET status=%s, fb_content=%s, updated_at=NOW() WHERE id=%s", (final, msg, d['id'])); conn.commit()
-    conn.close()
-    return {"message": f"Cola: {final}"}
+def pub_next(limit: int = Query(1, ge=1, le=200), user: dict=Depends(get_current_user)):
+    # La cola también respeta el modo de cada post
+    done = _claim_and_publish("status='publicar' ORDER BY updated_at ASC", limit)
+    if not done: return {"message": "Nada en cola"}
+    return {"message": _publish_summary("Cola", done)}
 
 # Endpoints manuales (para pruebas directas desde botón)
 @app.post("/posts/{post_id}/publish-rebound")
@@ -488,6 +1010,8 @@ def publish_rebound_link(post_id: int, user: dict=Depends(get_current_user)):
 @app.post("/posts/errors/clear")
 def clear_err(user: dict=Depends(get_current_user)):
     conn = get_db_connection()
-    with conn.cursor() as cur: cur.execute("DELETE FROM posts WHERE status IN ('error','error_publishing')"); conn.commit()
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM post_destinations pd USING posts p WHERE pd.post_id=p.id AND p.status IN ('error','error_publishing')")
+        cur.execute("DELETE FROM posts WHERE status IN ('error','error_publishing')"); conn.commit()
     conn.close()
     return {"message": "OK"}
\ No newline at end of file
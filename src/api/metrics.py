@@ -0,0 +1,192 @@
+# src/api/metrics.py
+# Métricas por ruta (latencia, tiempo en DB y en HTTP saliente), log de peticiones
+# lentas y un profiler por muestreo activable en caliente desde /admin/profiler.
+import os
+import sys
+import time
+import threading
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+
+import psycopg2.extensions
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "2000"))
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # src/
+
+# Acumulador de la petición en curso. El middleware crea el dict; los hilos del
+# threadpool de FastAPI heredan el contexto (y los del fan-out lo reciben copiado),
+# así que todos escriben en el mismo objeto.
+_current = ContextVar("request_stats", default=None)
+
+def start_request():
+    # El lock protege el dict: los hilos del fan-out escriben a la vez
+    stats = {"db": 0.0, "http": 0.0, "queries": [], "calls": [], "lock": threading.Lock()}
+    _current.set(stats)
+    return stats
+
+def record_query(query, elapsed):
+    stats = _current.get()
+    if stats is None: return
+    if isinstance(query, bytes): query = query.decode(errors="replace")
+    sql = " ".join(str(query).split())[:200]
+    with stats["lock"]:
+        stats["db"] += elapsed
+        stats["queries"].append((elapsed, sql))
+
+def record_http(host, elapsed):
+    stats = _current.get()
+    if stats is None: return
+    with stats["lock"]:
+        stats["http"] += elapsed
+        stats["calls"].append((elapsed, host))
+
+
+# --- DB: cursores cronometrados ---
+@lru_cache(maxsize=None)
+def _timed_cursor(base):
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            t0 = time.perf_counter()
+            try: return super().execute(query, vars)
+            finally: record_query(query, time.perf_counter() - t0)
+    TimedCursor.__name__ = f"Timed{base.__name__}"
+    return TimedCursor
+
+class TimedConnection(psycopg2.extensions.connection):
+    """connection_factory para psycopg2: todo cursor (incluido DictCursor) mide sus execute()."""
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+
+# --- Agregados por ruta y log de lentas ---
+class RouteMetrics:
+    def __init__(self, window=200, slow_log_size=50):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(lambda: {"count": 0, "total": 0.0, "db": 0.0, "http": 0.0, "max": 0.0, "recent": deque(maxlen=window)})
+        self.slow = deque(maxlen=slow_log_size)
+
+    def record(self, route, elapsed, stats):
+        with self._lock:
+            r = self._routes[route]
+            r["count"] += 1
+            r["total"] += elapsed
+            r["db"] += stats["db"]
+            r["http"] += stats["http"]
+            r["max"] = max(r["max"], elapsed)
+            r["recent"].append(elapsed)
+        if elapsed * 1000 >= SLOW_REQUEST_MS: self._log_slow(route, elapsed, stats)
+
+    def _log_slow(self, route, elapsed, stats):
+        top = sorted(stats["queries"], reverse=True)[:5]
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "route": route,
+            "total_ms": round(elapsed * 1000, 1),
+            "db_ms": round(stats["db"] * 1000, 1),
+            "http_ms": round(stats["http"] * 1000, 1),
+            "queries": len(stats["queries"]),
+            "top_queries": [{"ms": round(t * 1000, 1), "sql": q} for t, q in top],
+            "http_calls": [{"ms": round(t * 1000, 1), "host": h} for t, h in sorted(stats["calls"], reverse=True)[:5]],
+        }
+        self.slow.append(entry)
+        print(f"🐢 Lenta: {route} {entry['total_ms']}ms (DB {entry['db_ms']}ms en {entry['queries']} queries, HTTP {entry['http_ms']}ms)")
+        for q in entry["top_queries"]: print(f"     {q['ms']}ms  {q['sql']}")
+
+    def snapshot(self):
+        with self._lock: items = [(k, dict(v, recent=list(v["recent"]))) for k, v in self._routes.items()]
+        out = []
+        for route, r in items:
+            recent = sorted(r["recent"])
+            p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+            out.append({
+                "route": route,
+                "count": r["count"],
+                "avg_ms": round(r["total"] / r["count"] * 1000, 1),
+                "p95_ms": round(p95 * 1000, 1),
+                "max_ms": round(r["max"] * 1000, 1),
+                "avg_db_ms": round(r["db"] / r["count"] * 1000, 1),
+                "avg_http_ms": round(r["http"] / r["count"] * 1000, 1),
+            })
+        return sorted(out, key=lambda x: x["avg_ms"] * x["count"], reverse=True)
+
+
+# --- Profiler por muestreo ---
+class SamplingProfiler:
+    """Muestrea las pilas de todos los hilos mientras haya peticiones perfiladas en curso
+    y acumula las que pasan por código de la app (src/). La salida está en formato
+    "folded" (una pila por línea + conteo), que aceptan flamegraph.pl y speedscope.
+    Con peticiones concurrentes se mezclan las pilas de todas; perfilar por ruta ayuda."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._active = 0
+        self.remaining = 0
+        self.route = None
+        self.samples = 0
+        self.profiled = 0
+        self.stacks = Counter()
+
+    def arm(self, requests, route=None):
+        with self._lock:
+            self.remaining, self.route = requests, route
+            self.samples, self.profiled = 0, 0
+            self.stacks = Counter()
+        return self.status()
+
+    def disarm(self):
+        with self._lock: self.remaining = 0
+        return self.status()
+
+    def status(self):
+        return {"remaining": self.remaining, "route": self.route, "profiled_requests": self.profiled, "samples": self.samples, "interval_ms": self.interval * 1000}
+
+    def claim(self, route):
+        """True si esta petición debe perfilarse (consume uno de los N pendientes)."""
+        with self._lock:
+            if self.remaining <= 0 or (self.route and self.route != route): return False
+            self.remaining -= 1
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self.profiled += 1
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if self._active <= 0:
+                    self._thread = None
+                    return
+            for tid, frame in sys._current_frames().items():
+                if tid == me: continue
+                stack, in_app = [], False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or code.co_filename.startswith(APP_DIR)
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if in_app:
+                    with self._lock:
+                        self.stacks[";".join(reversed(stack))] += 1
+                        self.samples += 1
+            time.sleep(self.interval)
+
+    def folded(self):
+        with self._lock: stacks = list(self.stacks.items())
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(stacks, key=lambda x: -x[1]))
+
+
+METRICS = RouteMetrics()
+PROFILER = SamplingProfiler()
@@ -2,6 +2,7 @@
 import psycopg2
 import os
 from passlib.context import CryptContext
+from schema import apply_schema
 
 # Configuración Inteligente:
 # Si estamos en Docker, usa 'db'. Si ejecutamos manual, intenta 'localhost'.
@@ -24,46 +25,7 @@ def create_admin_user():
 
         # 1. Crear Tablas
         print("1. Creando tablas...")
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY, 
-                username VARCHAR(50) UNIQUE, 
-                hashed_password VARCHAR(255), 
-                full_name VARCHAR(100), 
-                role VARCHAR(20)
-            );
-        """)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key VARCHAR(50) PRIMARY KEY, 
-                value_int INT
-            );
-        """)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS posts (
-                id SERIAL PRIMARY KEY, 
-                source_url TEXT UNIQUE, 
-                source_title TEXT, 
-                image_url TEXT, 
-                status VARCHAR(50) DEFAULT 'crudo', 
-                category VARCHAR(100) DEFAULT 'General', 
-                fb_title TEXT, 
-                fb_content TEXT, 
-                wp_title TEXT, 
-                wp_content TEXT, 
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
-                scheduled_at TIMESTAMP WITHOUT TIME ZONE, 
-                publication_mode VARCHAR(50) DEFAULT 'auto'
-            );
-        """)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS sources (
-                id SERIAL PRIMARY KEY, 
-                name VARCHAR(100) UNIQUE, 
-                scrape_url TEXT, 
-                is_active BOOLEAN DEFAULT TRUE
-            );
-        """)
+        apply_schema(cur)
 
         # 2. Datos Iniciales: Fuentes
         print("2. Configurando fuentes...")
@@ -88,11 +50,11 @@ def create_admin_user():
             ON CONFLICT (username) DO UPDATE SET hashed_password=EXCLUDED.hashed_password;
         """, (hashed,))
         
-        # 4. Datos Iniciales: Tiempos (5 y 45)
+        # 4. Datos Iniciales: Tiempos (5 y 45) y retención (30 días antes de archivar)
         print("4. Configurando tiempos...")
         cur.execute("""
             INSERT INTO settings (key, value_int) 
-            VALUES ('scraper_interval', 5), ('publish_interval', 45) 
+            VALUES ('scraper_interval', 5), ('publish_interval', 45), ('archive_after_days', 30) 
             ON CONFLICT (key) DO UPDATE SET value_int=EXCLUDED.value_int;
         """)
         
@@ -0,0 +1,115 @@
+# src/resilience.py
+# Circuit breakers por host + backoff exponencial con jitter.
+# Si un host (fuente, WordPress, Graph API) falla seguido, se deja de llamarlo durante
+# un tiempo y las llamadas fallan al instante en vez de esperar el timeout completo.
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+FAILURE_THRESHOLD = 3     # fallos consecutivos para abrir el breaker
+BASE_COOLDOWN = 30        # segundos abierto tras el primer disparo
+MAX_COOLDOWN = 15 * 60    # tope del backoff exponencial
+
+
+class CircuitOpenError(Exception):
+    """El breaker del host está abierto: se falla rápido sin hacer la llamada."""
+
+
+class CircuitBreaker:
+    def __init__(self, host, failure_threshold=FAILURE_THRESHOLD, base_cooldown=BASE_COOLDOWN, max_cooldown=MAX_COOLDOWN):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0       # fallos consecutivos
+        self.trips = 0          # aperturas consecutivas (exponente del backoff)
+        self.opened_until = 0.0
+        self.half_open = False  # dejando pasar una sola llamada de prueba
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_until > time.monotonic(): return "open"
+        if self.half_open or self.trips: return "half_open"
+        return "closed"
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.opened_until > now: return False
+            if self.trips:
+                # Cooldown vencido: solo una llamada de prueba a la vez
+                if self.half_open: return False
+                self.half_open = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures, self.trips, self.half_open, self.opened_until = 0, 0, False, 0.0
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)[:200] if error else None
+            if self.half_open or self.failures >= self.failure_threshold:
+                self.trips += 1
+                self.opened_until = time.monotonic() + backoff_delay(self.trips, self.base_cooldown, self.max_cooldown)
+                self.half_open = False
+                self.failures = 0
+
+    def snapshot(self):
+        return {
+            "host": self.host,
+            "state": self.state,
+            "trips": self.trips,
+            "retry_in": max(0, round(self.opened_until - time.monotonic(), 1)),
+            "last_error": self.last_error,
+        }
+
+
+def backoff_delay(attempt, base, cap):
+    """Backoff exponencial con jitter: aleatorio entre la mitad y el total de min(cap, base*2^(n-1))."""
+    ceiling = min(cap, base * (2 ** (attempt - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+def breaker_for(url):
+    host = urlparse(url).netloc.lower() or url
+    with _BREAKERS_LOCK:
+        if host not in _BREAKERS: _BREAKERS[host] = CircuitBreaker(host)
+        return _BREAKERS[host]
+
+def breakers_snapshot():
+    with _BREAKERS_LOCK: breakers = list(_BREAKERS.values())
+    return [b.snapshot() for b in breakers]
+
+
+# Callbacks (host, segundos) tras cada llamada; la API los usa para sus métricas
+OBSERVERS = []
+
+def _is_failure(resp):
+    # 5xx y 429 indican host caído/saturado; otros 4xx son errores de la petición, no del host
+    return resp.status_code >= 500 or resp.status_code == 429
+
+def guarded_request(method, url, session=None, **kwargs):
+    """Como requests.request, pero pasando por el breaker del host.
+    Lanza CircuitOpenError sin tocar la red si el breaker está abierto."""
+    breaker = breaker_for(url)
+    if not breaker.allow(): raise CircuitOpenError(f"Circuito abierto para {breaker.host}")
+    t0 = time.perf_counter()
+    try: resp = (session or requests).request(method, url, **kwargs)
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    finally:
+        for observer in OBSERVERS: observer(breaker.host, time.perf_counter() - t0)
+    if _is_failure(resp): breaker.record_failure(f"HTTP {resp.status_code}")
+    else: breaker.record_success()
+    return resp
@@ -4,14 +4,12 @@ import schedule
 import time
 import sys
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# Importar scraper directamente para ejecución interna
-try:
-    import scraper
-except ImportError:
-    # Ajuste de ruta si se ejecuta como script suelto
-    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    import scraper
+# Ajuste de ruta para que el worker pueda importar 'scraper' si se ejecuta como script suelto
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # --- CONFIGURACIÓN INTELIGENTE ---
 # Si existe API_URL (Docker), úsala. Si no, usa localhost (Local).
@@ -20,14 +18,63 @@ API_URL = os.getenv("API_URL", "http://localhost:8000")
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"
 
+CATCHUP_LIMIT = int(os.getenv("CATCHUP_LIMIT", "50"))   # máx. posts programados vencidos por ciclo
+SCRAPE_TIMEOUT = int(os.getenv("SCRAPE_TIMEOUT", "900"))  # segundos antes de dar por colgado un ciclo del scraper
+READY_TIMEOUT = int(os.getenv("READY_TIMEOUT", "120"))  # segundos máximos esperando /readyz
+# Toda llamada a la API lleva timeout: una petición colgada dejaría su tarea "en curso"
+# para siempre y el dispatch omitiría todos los ciclos siguientes
+API_TIMEOUT = int(os.getenv("API_TIMEOUT", "30"))          # login y ajustes
+PUBLISH_TIMEOUT = int(os.getenv("PUBLISH_TIMEOUT", "600"))  # publicar (hasta CATCHUP_LIMIT posts) y archivar
+
 TOKEN = None
 SETTINGS = {"scraper_interval": 5, "publish_interval": 45}
 
+# --- WORKERS ---
+# El scraper corre en su propio proceso (persistente: conserva la sesión HTTP entre ciclos)
+# y las llamadas a la API en hilos. El bucle de schedule solo despacha y nunca se bloquea.
+SCRAPER_POOL = None
+API_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api")
+RUNNING = {}  # nombre de tarea -> (Future en curso, inicio) para evitar ciclos solapados
+
+def get_scraper_pool():
+    # 'forkserver': el worker no se bifurca desde este proceso (que ya tiene hilos del API_POOL),
+    # así no hereda locks tomados en el momento del fork
+    global SCRAPER_POOL
+    if SCRAPER_POOL is None: SCRAPER_POOL = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("forkserver"))
+    return SCRAPER_POOL
+
+def recycle_scraper_pool():
+    # Descarta el pool (worker muerto o colgado) y mata su proceso si sigue vivo
+    global SCRAPER_POOL
+    pool, SCRAPER_POOL = SCRAPER_POOL, None
+    if pool is None: return
+    for proc in list((getattr(pool, '_processes', None) or {}).values()):
+        if proc.is_alive(): proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def dispatch(name, fn, pool=None, timeout=None):
+    prev, started = RUNNING.get(name, (None, 0))
+    if prev and not prev.done():
+        if timeout is None or time.monotonic() - started < timeout:
+            print(f"⏭️  {name}: el ciclo anterior sigue en curso, se omite")
+            return None
+        print(f"⚠️ {name}: ciclo colgado más de {timeout}s, se reinicia el worker")
+        recycle_scraper_pool()
+        pool = get_scraper_pool()
+    try: fut = (pool or API_POOL).submit(fn)
+    except BrokenProcessPool:
+        # El proceso del scraper murió: se recrea el pool y se reintenta una vez
+        recycle_scraper_pool()
+        fut = get_scraper_pool().submit(fn)
+    fut.add_done_callback(lambda f: not f.cancelled() and f.exception() and print(f"❌ Error en {name}: {f.exception()}"))
+    RUNNING[name] = (fut, time.monotonic())
+    return fut
+
 def login():
     global TOKEN
     print(f"--- [Scheduler] Conectando a API: {API_URL} ---")
     try:
-        resp = requests.post(f"{API_URL}/token", data={'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+        resp = requests.post(f"{API_URL}/token", data={'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD}, timeout=API_TIMEOUT)
         if resp.ok:
             TOKEN = resp.json()['access_token']
             print("✅ Login OK")
@@ -37,26 +84,45 @@ def login():
         print(f"❌ Error Conexión: {e}")
     return False
 
+def wait_for_api(timeout=READY_TIMEOUT):
+    # Sondea /readyz (DB accesible) en lugar de dormir un tiempo fijo
+    print(f"--- [Scheduler] Esperando API lista: {API_URL}/readyz ---")
+    deadline, delay = time.monotonic() + timeout, 0.5
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{API_URL}/readyz", timeout=5).ok:
+                print("✅ API lista")
+                return True
+        except requests.RequestException: pass
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
+    print(f"⚠️ API no lista tras {timeout}s, se continúa de todos modos")
+    return False
+
 def load_settings():
     if not TOKEN: return
     try:
-        resp = requests.get(f"{API_URL}/settings", headers={'Authorization': f'Bearer {TOKEN}'})
+        resp = requests.get(f"{API_URL}/settings", headers={'Authorization': f'Bearer {TOKEN}'}, timeout=API_TIMEOUT)
         if resp.ok:
             data = resp.json()
             SETTINGS.update(data)
             print(f"✅ Configuración: Scraper {SETTINGS['scraper_interval']}m / Publicador {SETTINGS['publish_interval']}m")
     except: pass
 
+def scrape_cycle():
+    # Se ejecuta dentro del proceso worker
+    import scraper
+    scraper.main()
+
 def run_scraper():
     print("\n--- 🕵️  Ejecutando Scraper ---")
-    try: scraper.main()
-    except Exception as e: print(f"❌ Error en Scraper: {e}")
+    dispatch("scraper", scrape_cycle, get_scraper_pool(), timeout=SCRAPE_TIMEOUT)
 
 def run_publisher():
     print("\n--- 📢  Ejecutando Publicador (Cola) ---")
     if not TOKEN: login()
     try:
-        resp = requests.post(f"{API_URL}/posts/publish-next", headers={'Authorization': f'Bearer {TOKEN}'})
+        resp = requests.post(f"{API_URL}/posts/publish-next", headers={'Authorization': f'Bearer {TOKEN}'}, timeout=PUBLISH_TIMEOUT)
         print(f"   Resultado: {resp.json()}")
     except Exception as e: print(f"❌ Error Publicando: {e}")
 
@@ -64,19 +130,32 @@ def check_scheduled():
     # Tarea de 1 minuto para posts programados
     if not TOKEN: login()
     try:
-        resp = requests.post(f"{API_URL}/posts/publish-scheduled", headers={'Authorization': f'Bearer {TOKEN}'})
+        # Publica todos los vencidos (p.ej. tras una caída); la API agrupa Facebook en batch
+        resp = requests.post(f"{API_URL}/posts/publish-scheduled", params={'limit': CATCHUP_LIMIT}, headers={'Authorization': f'Bearer {TOKEN}'}, timeout=PUBLISH_TIMEOUT)
         if "Nada" not in resp.text: print(f"⏰ Programado: {resp.json()}")
     except: pass
 
+def run_archiver():
+    # Tarea diaria: mueve publicados/eliminados antiguos a posts_archive
+    if not TOKEN: login()
+    try:
+        resp = requests.post(f"{API_URL}/posts/archive", headers={'Authorization': f'Bearer {TOKEN}'}, timeout=PUBLISH_TIMEOUT)
+        print(f"🗄️  Archivo: {resp.json()}")
+    except Exception as e: print(f"❌ Error Archivando: {e}")
+
 if __name__ == "__main__":
     print("--- INICIANDO SCHEDULER (NUEVO PROYECTO) ---")
-    time.sleep(5) # Espera de cortesía para que arranque la API
-    login()
+    wait_for_api()
+    # Reintentar el login para no perder el primer ciclo si la API acaba de levantar
+    for _ in range(5):
+        if login(): break
+        time.sleep(2)
     load_settings()
 
     schedule.every(SETTINGS['scraper_interval']).minutes.do(run_scraper)
-    # schedule.every(SETTINGS['publish_interval']).minutes.do(run_publisher)
-    schedule.every(1).minutes.do(check_scheduled)
+    # schedule.every(SETTINGS['publish_interval']).minutes.do(dispatch, "publisher", run_publisher)
+    schedule.every(1).minutes.do(dispatch, "scheduled", check_scheduled)
+    schedule.every().day.at("03:00").do(dispatch, "archiver", run_archiver)
 
     print("-> Tareas programadas y listas.")
     
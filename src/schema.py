@@ -0,0 +1,96 @@
+# src/schema.py
+# Esquema de la base de datos. Todo es idempotente (IF NOT EXISTS / DO NOTHING): la API lo
+# aplica al arrancar, así una actualización crea las tablas nuevas sin tocar datos ni
+# ajustes existentes. create_admin.py lo usa también antes de cargar los datos iniciales.
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY, 
+        username VARCHAR(50) UNIQUE, 
+        hashed_password VARCHAR(255), 
+        full_name VARCHAR(100), 
+        role VARCHAR(20)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS settings (
+        key VARCHAR(50) PRIMARY KEY, 
+        value_int INT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS posts (
+        id SERIAL PRIMARY KEY, 
+        source_url TEXT UNIQUE, 
+        source_title TEXT, 
+        image_url TEXT, 
+        status VARCHAR(50) DEFAULT 'crudo', 
+        category VARCHAR(100) DEFAULT 'General', 
+        fb_title TEXT, 
+        fb_content TEXT, 
+        wp_title TEXT, 
+        wp_content TEXT, 
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
+        scheduled_at TIMESTAMP WITHOUT TIME ZONE, 
+        publication_mode VARCHAR(50) DEFAULT 'auto'
+    );
+    """,
+    # Archivo: misma estructura que 'posts' (incluye UNIQUE source_url) para que
+    # "INSERT ... SELECT *" sea directo. Si se altera 'posts', alterar también este.
+    "CREATE TABLE IF NOT EXISTS posts_archive (LIKE posts INCLUDING ALL);",
+    "CREATE INDEX IF NOT EXISTS idx_posts_status_updated ON posts (status, updated_at);",
+    """
+    CREATE TABLE IF NOT EXISTS sources (
+        id SERIAL PRIMARY KEY, 
+        name VARCHAR(100) UNIQUE, 
+        scrape_url TEXT, 
+        is_active BOOLEAN DEFAULT TRUE
+    );
+    """,
+    # Destinos de publicación (varias páginas FB / sitios WP). Si no hay ninguno,
+    # se usan FACEBOOK_PAGE_ID / WP_URL del .env como antes.
+    """
+    CREATE TABLE IF NOT EXISTS destinations (
+        id SERIAL PRIMARY KEY, 
+        name VARCHAR(100) UNIQUE, 
+        kind VARCHAR(20) NOT NULL, 
+        base_url TEXT, 
+        account_id TEXT, 
+        secret TEXT, 
+        site_id INT REFERENCES destinations(id) ON DELETE SET NULL, 
+        max_parallel INT DEFAULT 2, 
+        is_active BOOLEAN DEFAULT TRUE
+    );
+    """,
+    # Sin FK a posts: el historial sobrevive al archivado de posts
+    """
+    CREATE TABLE IF NOT EXISTS post_destinations (
+        post_id INT NOT NULL, 
+        destination_id INT NOT NULL REFERENCES destinations(id) ON DELETE CASCADE, 
+        status VARCHAR(50) DEFAULT 'pendiente', 
+        link TEXT, 
+        result TEXT, 
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
+        PRIMARY KEY (post_id, destination_id)
+    );
+    """,
+    # Último estado de los circuit breakers de otros procesos (el scraper lo guarda al final de
+    # cada ciclo) para que /resilience/breakers muestre también los de las fuentes
+    """
+    CREATE TABLE IF NOT EXISTS breaker_states (
+        process VARCHAR(20) NOT NULL, 
+        host TEXT NOT NULL, 
+        trips INT DEFAULT 0, 
+        retry_until TIMESTAMP, 
+        last_error TEXT, 
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
+        PRIMARY KEY (process, host)
+    );
+    """,
+    # Ajustes añadidos después de la instalación inicial (no pisa valores existentes)
+    "INSERT INTO settings (key, value_int) VALUES ('archive_after_days', 30) ON CONFLICT (key) DO NOTHING;",
+]
+
+def apply_schema(cur):
+    for ddl in SCHEMA: cur.execute(ddl)
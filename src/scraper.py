@@ -4,11 +4,10 @@ import psycopg2.extras
 import requests
 from bs4 import BeautifulSoup
 import os
-import trafilatura
-from trafilatura.settings import DEFAULT_CONFIG
-from configparser import ConfigParser
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin, urlparse
 from dotenv import load_dotenv
+from resilience import guarded_request, breakers_snapshot
 
 # --- Configuración Inteligente (Carga desde .env o Entorno) ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -22,10 +21,12 @@ DB_PASS = os.getenv("DB_PASSWORD", "mypassword")
 DB_HOST = os.getenv("DB_HOST", "db") # En el nuevo proyecto Docker, el host es 'db'
 DB_PORT = os.getenv("DB_PORT", "5432")
 
-# --- Configuración de Trafilatura ---
-new_config = ConfigParser()
-new_config.read_dict(DEFAULT_CONFIG)
-new_config.set("DEFAULT", "EXTRACTION_TIMEOUT", "15")
+# --- Sesión HTTP persistente (reutiliza conexiones entre fuentes y ciclos del worker) ---
+FETCH_TIMEOUT = 15
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"})
+SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+SESSION.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
 
 # --- Mapeo de Categorías (Tu lista original) ---
 MAPA_DE_CATEGORIAS = {
@@ -91,10 +92,16 @@ def clean_category(url):
         return "General"
     except: return "General"
 
+def fetch_html(url):
+    # Si la fuente viene fallando, el breaker corta en seco en lugar de esperar el timeout
+    r = guarded_request("get", url, session=SESSION, timeout=FETCH_TIMEOUT)
+    r.raise_for_status()
+    return r.text
+
 def scrape_main_story(name, url):
     print(f"  Scanning: {name} ({url})...")
     try:
-        html = trafilatura.fetch_url(url, config=new_config)
+        html = fetch_html(url)
         if not html: return None
         soup = BeautifulSoup(html, 'html.parser')
 
@@ -135,9 +142,10 @@ def save_to_db(item):
     if not conn: return
     try:
         with conn.cursor() as cur:
+            # Deduplicar también contra el archivo (posts antiguos ya movidos fuera de 'posts')
             cur.execute(
-                "INSERT INTO posts (source_url, source_title, image_url, category, status) VALUES (%s, %s, %s, %s, 'crudo') ON CONFLICT (source_url) DO NOTHING",
-                (item['source_url'], item['source_title'], item['image_url'], item['category'])
+                "INSERT INTO posts (source_url, source_title, image_url, category, status) SELECT %s, %s, %s, %s, 'crudo' WHERE NOT EXISTS (SELECT 1 FROM posts_archive WHERE source_url = %s) ON CONFLICT (source_url) DO NOTHING",
+                (item['source_url'], item['source_title'], item['image_url'], item['category'], item['source_url'])
             )
             if cur.rowcount > 0: print(f"  ✅ NUEVA: {item['source_title']}")
             else: print(f"  💤 Repetida: {item['source_title']}")
@@ -145,6 +153,22 @@ def save_to_db(item):
     except Exception as e: print(f"❌ Error guardando: {e}")
     finally: conn.close()
 
+def save_breakers():
+    # Los breakers de las fuentes viven en este proceso worker: se guardan para que la API los muestre
+    states = [(b['host'], b['trips'], b['retry_in'], b['last_error']) for b in breakers_snapshot()]
+    if not states: return
+    conn = get_db_connection()
+    if not conn: return
+    try:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO breaker_states (process, host, trips, retry_until, last_error, updated_at) VALUES %s
+                ON CONFLICT (process, host) DO UPDATE SET trips=EXCLUDED.trips, retry_until=EXCLUDED.retry_until, last_error=EXCLUDED.last_error, updated_at=EXCLUDED.updated_at
+            """, states, template="('scraper', %s, %s, LOCALTIMESTAMP + make_interval(secs => %s), %s, LOCALTIMESTAMP)")
+            conn.commit()
+    except Exception as e: print(f"❌ Error guardando breakers: {e}")
+    finally: conn.close()
+
 def main():
     print("--- 🕵️  SCRAPER INICIADO ---")
     conn = get_db_connection()
@@ -154,6 +178,7 @@ def main():
     for s in sources:
         item = scrape_main_story(s['name'], s['scrape_url'])
         if item: save_to_db(item)
+    save_breakers()
     print("--- FIN ---")
 
 if __name__ == "__main__": main()
\ No newline at end of file
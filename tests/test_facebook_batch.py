@@ -0,0 +1,152 @@
+# tests/test_facebook_batch.py
+# publish_batch_to_facebook contra un servidor Graph falso local (http.server).
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+import src.resilience as resilience
+from src.api import main
+
+
+class FakeGraph(ThreadingHTTPServer):
+    """Responde a /{version} (batch) y /{version}/{page}/{edge} (llamada individual).
+    `sub_response(i, op)` decide cada sub-respuesta del batch; `batch_status`, `batch_delay`
+    y `batch_bodies` (nº de batch -> cuerpo 200 en lugar de la lista) simulan fallos del batch entero."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeGraphHandler)
+        self.batches, self.singles = [], []
+        self.batch_status, self.batch_delay, self.batch_bodies = 200, 0, {}
+        self.sub_response = lambda i, op: {"code": 200, "body": json.dumps({"id": post_title(op["body"])})}
+
+
+class FakeGraphHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args): pass
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        srv = self.server
+        if "batch" in form:
+            ops = json.loads(form["batch"][0])
+            srv.batches.append(ops)
+            time.sleep(srv.batch_delay)
+            if srv.batch_status != 200: return self._reply(srv.batch_status, {"error": {"message": "batch caído"}})
+            if len(srv.batches) - 1 in srv.batch_bodies: return self._reply(200, srv.batch_bodies[len(srv.batches) - 1])
+            return self._reply(200, [srv.sub_response(i, op) for i, op in enumerate(ops)])
+        srv.singles.append(form)
+        self._reply(200, {"id": f"single-{post_title_from_form(form)}"})
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def post_title_from_form(form):
+    # El título del post es la primera línea del mensaje/caption
+    return (form.get("message") or form.get("caption"))[0].split("\n")[0]
+
+
+def post_title(op_body):
+    return post_title_from_form(parse_qs(op_body))
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    srv = FakeGraph()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    monkeypatch.setattr(main, "FACEBOOK_GRAPH_API_URL_BASE", f"http://127.0.0.1:{srv.server_port}/v18.0")
+    monkeypatch.setattr(main, "FACEBOOK_PAGE_ID", "PAGE")
+    monkeypatch.setattr(main, "FACEBOOK_ACCESS_TOKEN", "TOKEN")
+    monkeypatch.setattr(resilience, "_BREAKERS", {})
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def make_items(n):
+    posts = [{"fb_title": f"post-{i}", "fb_content": "texto", "source_url": f"https://fuente/{i}",
+              "image_url": f"https://img/{i}.jpg" if i % 2 else None} for i in range(n)]
+    return [(p, f"https://wp/{i}", False) for i, p in enumerate(posts)]
+
+
+def test_batch_maps_each_sub_response_to_its_post(graph):
+    results = main.publish_batch_to_facebook(make_items(5))
+    assert len(graph.batches) == 1 and len(graph.batches[0]) == 5
+    assert not graph.singles
+    assert results == [(True, {"id": f"post-{i}"}) for i in range(5)]
+    # Con imagen va a /photos, sin imagen a /feed; el token no viaja en cada operación
+    assert [op["relative_url"] for op in graph.batches[0]] == ["PAGE/feed", "PAGE/photos"] * 2 + ["PAGE/feed"]
+    assert all("access_token" not in op["body"] for op in graph.batches[0])
+
+
+def test_batch_splits_past_limit(graph):
+    results = main.publish_batch_to_facebook(make_items(120))
+    assert [len(b) for b in graph.batches] == [50, 50, 20]
+    assert results == [(True, {"id": f"post-{i}"}) for i in range(120)]
+
+
+def test_null_and_5xx_sub_responses_fall_back_to_single_calls(graph):
+    def sub(i, op):
+        if i == 1: return None
+        if i == 2: return {"code": 500, "body": "{}"}
+        if i == 3: return {"code": 400, "body": json.dumps({"error": {"message": "sin permiso"}})}
+        return {"code": 200, "body": json.dumps({"id": post_title(op["body"])})}
+    graph.sub_response = sub
+    results = main.publish_batch_to_facebook(make_items(4))
+    assert sorted(post_title_from_form(f) for f in graph.singles) == ["post-1", "post-2"]
+    assert results[0] == (True, {"id": "post-0"})
+    assert results[1] == (True, {"id": "single-post-1"})
+    assert results[2] == (True, {"id": "single-post-2"})
+    assert results[3][0] is False and "sin permiso" in results[3][1]
+
+
+def test_rejected_batch_is_retried_item_by_item(graph):
+    # 4xx: Graph no ejecutó ninguna operación
+    graph.batch_status = 400
+    results = main.publish_batch_to_facebook(make_items(3))
+    assert len(graph.batches) == 1 and len(graph.singles) == 3
+    assert results == [(True, {"id": f"single-post-{i}"}) for i in range(3)]
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_batch_5xx_is_ambiguous_and_not_resent(graph, status):
+    graph.batch_status = status
+    results = main.publish_batch_to_facebook(make_items(3))
+    assert not graph.singles
+    assert all(ok is False for ok, _ in results) and len(results) == 3
+
+
+@pytest.mark.parametrize("body", [{"error": {"message": "algo raro"}}, None])
+def test_non_list_batch_body_fails_only_its_chunk(graph, body):
+    # El primer chunk sale bien; el segundo recibe un 200 que no es una lista
+    graph.batch_bodies = {1: body}
+    results = main.publish_batch_to_facebook(make_items(main.FB_BATCH_LIMIT + 2))
+    assert results[:main.FB_BATCH_LIMIT] == [(True, {"id": f"post-{i}"}) for i in range(main.FB_BATCH_LIMIT)]
+    assert [ok for ok, _ in results[main.FB_BATCH_LIMIT:]] == [False, False]
+    assert not graph.singles
+
+
+def test_ambiguous_batch_failure_is_not_resent(graph, monkeypatch):
+    # Timeout de lectura: Graph pudo haber publicado parte del batch
+    monkeypatch.setattr(main, "FB_BATCH_TIMEOUT", 0.2)
+    graph.batch_delay = 1
+    results = main.publish_batch_to_facebook(make_items(3))
+    assert not graph.singles
+    assert all(ok is False for ok, _ in results) and len(results) == 3
+
+
+def test_unreachable_graph_counts_as_never_sent():
+    with pytest.raises(requests.ConnectionError) as exc:
+        requests.post("http://127.0.0.1:9/v18.0", timeout=2)
+    assert main._batch_never_sent(exc.value)
+    assert main._batch_never_sent(resilience.CircuitOpenError("abierto"))
+    assert not main._batch_never_sent(requests.ReadTimeout("lectura"))
@@ -0,0 +1,37 @@
+# tests/test_health.py
+# /healthz y /readyz sin DB real: get_db_connection se sustituye por dobles.
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import main
+
+
+class FakeConn:
+    def __init__(self, fail=False): self.fail = fail
+    def cursor(self): return self
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def execute(self, sql):
+        if self.fail: raise psycopg2.OperationalError("server closed the connection")
+    def close(self): pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "SCHEMA_READY", True)
+    return TestClient(main.app)  # sin 'with': no corre el lifespan (migración)
+
+
+def test_healthz_does_not_touch_the_db(client, monkeypatch):
+    monkeypatch.setattr(main, "get_db_connection", lambda: pytest.fail("healthz no debe abrir conexiones"))
+    assert client.get("/healthz").json() == {"status": "ok"}
+
+
+def test_readyz_checks_the_db_on_every_call_after_the_schema_is_applied(client, monkeypatch):
+    monkeypatch.setattr(main, "get_db_connection", lambda: FakeConn())
+    assert client.get("/readyz").status_code == 200
+    monkeypatch.setattr(main, "get_db_connection", lambda: None)
+    assert client.get("/readyz").status_code == 503
+    monkeypatch.setattr(main, "get_db_connection", lambda: FakeConn(fail=True))
+    assert client.get("/readyz").status_code == 503
@@ -0,0 +1,32 @@
+# tests/test_import_time.py
+# La API debe arrancar rápido: trafilatura, openai y passlib se cargan en su primer uso.
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("trafilatura", "openai", "passlib")
+# Presupuesto generoso (ms) para máquinas lentas; hoy ronda los 0.7 s, casi todo FastAPI/pydantic
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "3000"))
+
+
+def import_main():
+    # Proceso nuevo: en este ya hay módulos importados por otros tests
+    code = f"import json, sys; import src.api.main; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout), proc.stderr
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    loaded, _ = import_main()
+    assert loaded == []
+
+
+def test_api_import_stays_within_budget():
+    _, report = import_main()
+    # Formato de -X importtime: "import time: self [us] | cumulative | módulo"
+    cumulative = {m.group(2).strip(): int(m.group(1)) for m in re.finditer(r"import time:\s+\d+ \|\s+(\d+) \| (.+)", report)}
+    assert cumulative["src.api.main"] / 1000 < IMPORT_BUDGET_MS, sorted(cumulative.items(), key=lambda x: -x[1])[:10]
@@ -0,0 +1,29 @@
+# tests/test_metrics.py
+# Claves de ruta del middleware de tiempos y reparto del profiler.
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import main
+from src.api.metrics import RouteMetrics, SamplingProfiler
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "METRICS", RouteMetrics())
+    monkeypatch.setattr(main, "PROFILER", SamplingProfiler())
+    return TestClient(main.app)  # sin 'with': no corre el lifespan (migración)
+
+
+def test_unmatched_paths_share_one_metrics_entry(client):
+    for i in range(3): assert client.get(f"/wp-admin/x{i}.php").status_code == 404
+    client.get("/healthz")
+    routes = {r["route"]: r["count"] for r in main.METRICS.snapshot()}
+    assert routes == {main.UNMATCHED_ROUTE: 3, "GET /healthz": 1}
+
+
+def test_healthchecks_do_not_consume_profiler_requests(client):
+    main.PROFILER.arm(2)
+    for _ in range(5): client.get("/healthz")
+    assert main.PROFILER.status()["remaining"] == 2
+    client.get("/wp-admin/x.php")
+    assert main.PROFILER.status()["remaining"] == 1
@@ -0,0 +1,48 @@
+# tests/test_publish_targets.py
+# Elección de destinos: el .env solo se usa si no hay ningún destino registrado.
+import psycopg2
+import pytest
+
+from src.api import main
+
+
+class FakeConn:
+    """Responde a las dos consultas de get_publish_targets: EXISTS y la lista de destinos."""
+    def __init__(self, any_destination=True, targets=(), fail=False):
+        self.any_destination, self.targets, self.fail = any_destination, list(targets), fail
+        self.last = None
+    def cursor(self, **kwargs): return self
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def execute(self, sql, vars=None):
+        if self.fail: raise psycopg2.OperationalError("connection reset")
+        self.last = sql
+    def fetchone(self): return (self.any_destination,)
+    def fetchall(self): return self.targets
+    def close(self): pass
+
+
+def use_db(monkeypatch, conn):
+    monkeypatch.setattr(main, "get_db_connection", lambda: conn)
+
+
+def test_no_destinations_at_all_uses_the_env_path(monkeypatch):
+    use_db(monkeypatch, FakeConn(any_destination=False))
+    assert main.get_publish_targets(1) is None
+
+
+@pytest.mark.parametrize("conn", [None, FakeConn(fail=True), FakeConn(targets=[])], ids=["sin-conexion", "error-sql", "destinos-inactivos"])
+def test_unknown_or_inactive_targets_are_an_error_not_the_env_path(monkeypatch, conn):
+    use_db(monkeypatch, conn)
+    with pytest.raises(main.PublishTargetsError):
+        main.get_publish_targets(1)
+
+
+def test_target_errors_never_publish_through_the_env(monkeypatch):
+    use_db(monkeypatch, FakeConn(fail=True))
+    monkeypatch.setattr(main, "publish_to_wordpress", lambda *a, **k: pytest.fail("no debe publicar en el WP del .env"))
+    monkeypatch.setattr(main, "publish_to_facebook", lambda *a, **k: pytest.fail("no debe publicar en la página del .env"))
+    monkeypatch.setattr(main, "publish_batch_to_facebook", lambda *a, **k: pytest.fail("no debe publicar en la página del .env"))
+    posts = [{"id": 1, "publication_mode": "auto"}, {"id": 2, "publication_mode": "rebote_link"}]
+    assert [st for st, _ in main.execute_publish_many(posts)] == ["error_publishing"] * 2
+    assert main.execute_publish(posts[0], "auto")[0] == "error_publishing"
@@ -0,0 +1,86 @@
+# tests/test_resilience.py
+# Transiciones del CircuitBreaker (cerrado → abierto → semiabierto → cerrado/abierto) y backoff.
+from types import SimpleNamespace
+
+import pytest
+
+import src.resilience as resilience
+from src.resilience import CircuitBreaker, CircuitOpenError, backoff_delay, guarded_request
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Reloj manual: el breaker solo usa time.monotonic (y perf_counter en guarded_request)
+    now = SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=lambda: now.t, perf_counter=lambda: now.t))
+    monkeypatch.setattr(resilience, "_BREAKERS", {})
+    return now
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold): breaker.record_failure("caído")
+
+
+def test_opens_after_consecutive_failures(clock):
+    b = CircuitBreaker("fuente", failure_threshold=3, base_cooldown=30)
+    b.record_failure("x"); b.record_failure("x")
+    assert b.state == "closed" and b.allow()
+    b.record_failure("x")
+    assert b.state == "open" and not b.allow()
+    assert 15 <= b.snapshot()["retry_in"] <= 30
+
+
+def test_success_resets_the_failure_count(clock):
+    b = CircuitBreaker("fuente", failure_threshold=3)
+    b.record_failure("x"); b.record_failure("x"); b.record_success()
+    b.record_failure("x"); b.record_failure("x")
+    assert b.state == "closed"
+
+
+def test_half_open_lets_a_single_probe_through_and_closes_on_success(clock):
+    b = CircuitBreaker("fuente", base_cooldown=30)
+    trip(b)
+    clock.t += 31
+    assert b.allow()       # llamada de prueba
+    assert not b.allow()   # las demás siguen cortadas mientras la prueba está en curso
+    assert b.state == "half_open"
+    b.record_success()
+    assert b.state == "closed" and b.trips == 0 and b.allow()
+
+
+def test_failed_probe_reopens_with_a_longer_cooldown(clock):
+    b = CircuitBreaker("fuente", base_cooldown=30, max_cooldown=900)
+    trip(b)
+    clock.t += 31
+    assert b.allow()
+    b.record_failure("sigue caído")  # basta un fallo en semiabierto
+    assert b.state == "open" and b.trips == 2
+    assert 30 <= b.snapshot()["retry_in"] <= 60
+
+
+def test_backoff_delay_doubles_with_jitter_and_is_capped():
+    for attempt, ceiling in [(1, 30), (2, 60), (3, 120), (10, 900)]:
+        delays = [backoff_delay(attempt, 30, 900) for _ in range(200)]
+        assert all(ceiling / 2 <= d <= ceiling for d in delays)
+        assert len(set(delays)) > 1
+
+
+class FakeSession:
+    def __init__(self, status): self.status, self.calls = status, 0
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(status_code=self.status)
+
+
+def test_guarded_request_fails_fast_while_open(clock):
+    session = FakeSession(503)
+    for _ in range(resilience.FAILURE_THRESHOLD): guarded_request("get", "https://fuente.pe/", session=session)
+    with pytest.raises(CircuitOpenError):
+        guarded_request("get", "https://fuente.pe/otra", session=session)
+    assert session.calls == resilience.FAILURE_THRESHOLD
+
+
+def test_client_errors_do_not_count_against_the_host(clock):
+    session = FakeSession(404)
+    for _ in range(resilience.FAILURE_THRESHOLD + 2): guarded_request("get", "https://fuente.pe/", session=session)
+    assert resilience.breaker_for("https://fuente.pe/").state == "closed"
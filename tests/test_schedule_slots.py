@@ -0,0 +1,34 @@
+# tests/test_schedule_slots.py
+# compute_schedule_slots y la validación de BulkSchedule (sin DB).
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import ValidationError
+
+from src.api.main import BulkSchedule, compute_schedule_slots
+
+SPACING = {"facebook": 30, "wordpress": 15}
+
+
+def at(hour, minute=0):
+    return datetime(2026, 1, 10, hour, minute)
+
+
+def test_slots_are_packed_from_window_start_with_the_largest_gap():
+    assert compute_schedule_slots(3, at(10), at(12), SPACING, []) == [at(10), at(10, 30), at(11)]
+
+
+def test_slots_skip_around_already_scheduled_posts():
+    slots = compute_schedule_slots(3, at(10), at(12), SPACING, [at(10, 10)])
+    assert slots == [at(10, 40), at(11, 10), at(11, 40)]
+    assert all(abs(s - at(10, 10)) >= timedelta(minutes=30) for s in slots)
+
+
+def test_window_too_small_returns_fewer_slots():
+    assert compute_schedule_slots(5, at(10), at(11), SPACING, []) == [at(10), at(10, 30), at(11)]
+    assert compute_schedule_slots(2, at(10), at(10, 20), SPACING, [at(10)]) == []
+
+
+def test_negative_spacing_is_rejected():
+    with pytest.raises(ValidationError):
+        BulkSchedule(ids=[1], window_start=at(10), window_end=at(12), spacing={"facebook": -30})